@@ -1,15 +1,23 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import plotly.express as px
+import plotly.graph_objects as go
 import os
 from openai import OpenAI
 import json
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from query_validation import is_valid_query
 
 #API CALL LIMITS
 API_CALL_LIMIT = 10
 
+# Caches keyed on filter selections keep only the most recent selections
+FILTER_CACHE_ENTRIES = 32
+
 if "api_calls" not in st.session_state:
     st.session_state["api_calls"] = 0
 
@@ -30,30 +38,240 @@ data_path = os.getenv("CLAIMS_DATA_PATH")
 
 client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
 
+@st.cache_resource
+def load_claims_table(path: str) -> pa.Table:
+    return pq.read_table(path)
+
+# Low-cardinality string columns stored as pandas categoricals
+CATEGORY_COLUMNS = [
+    "insurance_plan", "claim_status", "service_location", "provider_id",
+    "denial_reason", "gender", "procedure_code", "diagnosis_code"
+]
+
 @st.cache_data
 def load_claims_data(path: str) -> pd.DataFrame:
-    return pd.read_csv(path, parse_dates=["procedure_date", "submission_date"])
+    # Parquet keeps the date columns typed, so no parse_dates pass is needed
+    df = load_claims_table(path).to_pandas()
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype("category")
+        df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+    return df.astype({
+        "is_denied": "bool",
+        "is_outlier": "bool",
+        "age": "int8",
+        "turnaround_days": "int16"
+    })
+
+@st.cache_data
+def sidebar_meta(path: str) -> dict:
+    """
+    Option lists, slider bounds and procedure date range, computed once per dataset.
+    """
+    df = load_claims_data(path)
+    meta = {
+        col: df[col].cat.categories.tolist()
+        for col in ["insurance_plan", "provider_id", "claim_status", "service_location"]
+    }
+    meta["tmin"] = int(df["turnaround_days"].min())
+    meta["tmax"] = int(df["turnaround_days"].max())
+    meta["date_min"] = df["procedure_date"].min()
+    meta["date_max"] = df["procedure_date"].max()
+    return meta
+
+@st.cache_data
+def daily_status_cube(path: str) -> pd.DataFrame:
+    """
+    Claim counts per procedure day (rows) and claim status (columns) for the full dataset.
+    """
+    df = load_claims_data(path)
+    return (
+        df.groupby([df["procedure_date"].dt.floor("D"), "claim_status"], observed=True)
+        .size()
+        .unstack(fill_value=0)
+    )
 
 df = load_claims_data(data_path)
+meta = sidebar_meta(data_path)
 
 st.set_page_config(page_title="Claims Dashboard", layout="wide")
 
 # functions
-def is_valid_query(filter_str: str, valid_columns: list) -> bool:
+def category_mask(col: pd.Series, selected: list) -> np.ndarray:
+    """
+    Boolean mask of rows whose category is in selected, via a lookup table on the codes.
     """
-    Check if all column names used in the filter string exist in valid_columns.
+    # One extra slot so the -1 code (missing value) lands on False
+    lut = np.zeros(len(col.cat.categories) + 1, dtype=bool)
+    idx = col.cat.categories.get_indexer(selected)
+    lut[idx[idx >= 0]] = True
+    return lut[col.cat.codes.to_numpy()]
+
+def large_numbers(num) -> np.ndarray:
+    """
+    Format a number or array of numbers with K/M/B/T suffixes, e.g. 12345678 -> "12.3M".
     """
-    for col in valid_columns:
-        filter_str = filter_str.replace(f"`{col}`", "").replace(col, "")
-    # If any alphabetical characters remain, suspicious tokens exist
-    return filter_str.strip().replace(" ", "").isalnum() == False
-
-def large_numbers(num: float) -> str:
-    for unit in ["", "K", "M", "B"]:
-        if abs(num) < 1000:
-            return f"{num:.1f}{unit}"
-        num /= 1000
-    return f"{num:.1f}T"
+    num = np.asarray(num, dtype=float)
+    mag = np.floor(np.log10(np.maximum(np.abs(num), 1)) / 3).clip(0, 4).astype(int)
+    units = np.array(["", "K", "M", "B", "T"])
+    return np.char.add(np.char.mod("%.1f", num / 1000.0 ** mag), units[mag])
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def summarize_claims(filter_key: tuple, _df: pd.DataFrame, _status_cube: pd.DataFrame | None = None) -> dict:
+    """
+    KPI values and per-chart aggregates for one filter selection.
+    Cached on filter_key; _df is the matching filtered frame and is not hashed.
+    _status_cube, when given, is the daily status cube sliced to the selected statuses.
+    """
+    paid = _df["paid_amount"].to_numpy()
+
+    # One bincount over the provider x location x plan codes; each chart's totals are marginals of it
+    providers = _df["provider_id"].cat.categories
+    locations = _df["service_location"].cat.categories
+    plans = _df["insurance_plan"].cat.categories
+    shape = (len(providers), len(locations), len(plans))
+    prov_codes = _df["provider_id"].cat.codes.to_numpy().astype(np.int64)
+    loc_codes = _df["service_location"].cat.codes.to_numpy()
+    plan_codes = _df["insurance_plan"].cat.codes.to_numpy()
+    # Null codes are -1 and would land in a neighbouring cell (or make bincount raise); drop them like groupby does
+    known = (prov_codes >= 0) & (loc_codes >= 0) & (plan_codes >= 0)
+    joint = (prov_codes[known] * shape[1] + loc_codes[known]) * shape[2] + plan_codes[known]
+    paid_cube = np.bincount(joint, weights=paid[known], minlength=np.prod(shape)).reshape(shape)
+    rows_cube = np.bincount(joint, minlength=np.prod(shape)).reshape(shape)
+
+    # Top 10 providers without a full sort; providers with no rows are left out
+    prov_paid = paid_cube.sum(axis=(1, 2))
+    top_idx = np.flatnonzero(rows_cube.sum(axis=(1, 2)))
+    if len(top_idx) > 10:
+        top_idx = top_idx[np.argpartition(prov_paid[top_idx], -10)[-10:]]
+    top_idx = top_idx[np.argsort(prov_paid[top_idx])]
+    top_prov = pd.DataFrame({
+        "provider_id": providers[top_idx],
+        "paid_amount": prov_paid[top_idx]
+    })
+
+    loc_idx = np.flatnonzero(rows_cube.sum(axis=(0, 2)))
+    loc_paid = pd.DataFrame({
+        "service_location": locations[loc_idx],
+        "paid_amount": paid_cube.sum(axis=(0, 2))[loc_idx]
+    })
+    plan_idx = np.flatnonzero(rows_cube.sum(axis=(0, 1)))
+    plan_paid = pd.DataFrame({
+        "insurance_plan": plans[plan_idx],
+        "paid_amount": paid_cube.sum(axis=(0, 1))[plan_idx]
+    })
+
+    # Count denial reasons straight off the category codes; -1 means no reason
+    reasons = _df["denial_reason"].cat.categories
+    reason_codes = _df["denial_reason"].cat.codes.to_numpy()
+    denied = _df["is_denied"].to_numpy() & (reason_codes >= 0)
+    denial_counts = pd.DataFrame({
+        "denial_reason": reasons,
+        "count": np.bincount(reason_codes[denied], minlength=len(reasons))
+    })
+
+    if _status_cube is not None:
+        # Slice of the cached day x status cube instead of regrouping every row
+        monthly = (
+            _status_cube
+            .resample("MS")
+            .sum()
+            .stack()
+            .reset_index(name="count")
+        )
+        monthly = monthly[monthly["count"] > 0]
+        monthly.insert(0, "month", monthly.pop("procedure_date").dt.strftime("%Y-%m"))
+    else:
+        monthly = (
+            _df
+            .assign(month=lambda x: x["procedure_date"].dt.to_period("M").astype(str))
+            .groupby(["month", "claim_status"], observed=True)
+            .size()
+            .reset_index(name="count")
+        )
+
+    return {
+        "total_claims": len(_df),
+        "total_paid": paid.sum(),
+        "denied_rate": _df["is_denied"].mean(),
+        "top_prov": top_prov,
+        "denial_counts": (
+            denial_counts[denial_counts["count"] > 0]
+            .sort_values("count", ascending=False)
+        ),
+        "monthly": monthly,
+        "loc_paid": loc_paid,
+        "plan_paid": plan_paid
+    }
+
+# Chart builders, cached on filter_key so unchanged filters reuse the last figure
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def fig_turnaround(filter_key: tuple, _df: pd.DataFrame) -> go.Figure:
+    fig = px.histogram(
+        _df,
+        x="turnaround_days",
+        nbins=30,
+        title="Distribution of Turnaround Times"
+    )
+    fig.update_layout(xaxis_title="Days", yaxis_title="Claim Count")
+    return fig
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def fig_top_providers(filter_key: tuple, _top_prov: pd.DataFrame) -> go.Figure:
+    fig = px.bar(
+        _top_prov,
+        x="paid_amount",
+        y="provider_id",
+        orientation="h",
+        title="Top 10 Providers by Paid Amount"
+    )
+    fig.update_traces(
+        text=large_numbers(_top_prov["paid_amount"]),
+        textposition="inside",
+        insidetextanchor="start"
+    )
+    fig.update_layout(
+        xaxis_title="Total Paid $",
+        xaxis=dict(title=dict(text="Total Paid $", standoff=10), tickformat=".2s"),
+        yaxis_title="Provider",
+        yaxis=dict(autorange="reversed"),
+        margin=dict(l=80, r=40, t=40, b=60),
+        showlegend=False
+    )
+    return fig
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def fig_denial_reasons(filter_key: tuple, _denial_counts: pd.DataFrame) -> go.Figure:
+    fig = px.pie(
+        _denial_counts,
+        values="count",
+        names="denial_reason",
+        hole=0.4,
+        title="Denial Reasons Distribution"
+    )
+    fig.update_traces(textposition="inside", textinfo="percent+label")
+    return fig
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def fig_monthly_status(filter_key: tuple, _monthly: pd.DataFrame) -> go.Figure:
+    fig = px.line(_monthly, x="month", y="count", color="claim_status", title="Monthly Claim Status Trends")
+    fig.update_layout(xaxis_title="Month", yaxis_title="Claims")
+    return fig
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def fig_location_paid(filter_key: tuple, _loc_paid: pd.DataFrame) -> go.Figure:
+    fig = px.bar(
+        _loc_paid,
+        x="service_location",
+        y="paid_amount",
+        color="service_location",
+        title="Total Paid by Service Location"
+    )
+    fig.update_layout(showlegend=False, xaxis_title="Location", yaxis_title="Total Paid ($)")
+    return fig
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def fig_plan_paid(filter_key: tuple, _plan_paid: pd.DataFrame) -> go.Figure:
+    return px.treemap(_plan_paid, path=["insurance_plan"], values="paid_amount", title="Paid Amount by Insurance Plan")
 
 # Safe clear callback
 def clear_user_question():
@@ -63,7 +281,7 @@ def clear_user_question():
 st.sidebar.header("🔍 Filters")
 
 # Insurance Plan (multi-select)
-insurance_options = sorted(df["insurance_plan"].dropna().unique())
+insurance_options = meta["insurance_plan"]
 insurance_filter = st.sidebar.multiselect(
     "Insurance Plan(s)",
     options=insurance_options,
@@ -71,11 +289,11 @@ insurance_filter = st.sidebar.multiselect(
 )
 
 # Provider ID (selectbox)
-provider_options = ["All"] + sorted(df["provider_id"].dropna().unique())
+provider_options = ["All"] + meta["provider_id"]
 provider_filter = st.sidebar.selectbox("Provider ID", provider_options)
 
 # Claim Status (multi-select)
-status_options = sorted(df["claim_status"].dropna().unique())
+status_options = meta["claim_status"]
 status_filter = st.sidebar.multiselect(
     "Claim Status",
     options=status_options,
@@ -83,7 +301,7 @@ status_filter = st.sidebar.multiselect(
 )
 
 # Service Location (multi-select)
-location_options = sorted(df["service_location"].dropna().unique())
+location_options = meta["service_location"]
 location_filter = st.sidebar.multiselect(
     "Service Location",
     options=location_options,
@@ -91,8 +309,8 @@ location_filter = st.sidebar.multiselect(
 )
 
 # Turnaround Days (slider)
-min_days = int(df["turnaround_days"].min())
-max_days = int(df["turnaround_days"].max())
+min_days = meta["tmin"]
+max_days = meta["tmax"]
 turnaround_range = st.sidebar.slider(
     "Turnaround Days",
     min_value=min_days,
@@ -101,14 +319,28 @@ turnaround_range = st.sidebar.slider(
 )
 
 # ---------------- Filter Application ----------------
-sidebar_filtered_df = df[
-    (df["insurance_plan"].isin(insurance_filter)) &
-    (df["claim_status"].isin(status_filter)) &
-    (df["service_location"].isin(location_filter)) &
-    (df["turnaround_days"].between(*turnaround_range))
+turnaround = df["turnaround_days"].to_numpy()
+masks = [
+    category_mask(df["insurance_plan"], insurance_filter),
+    category_mask(df["claim_status"], status_filter),
+    category_mask(df["service_location"], location_filter),
+    turnaround >= turnaround_range[0],
+    turnaround <= turnaround_range[1]
 ]
 if provider_filter != "All":
-    sidebar_filtered_df = sidebar_filtered_df[sidebar_filtered_df["provider_id"] == provider_filter]
+    masks.append(category_mask(df["provider_id"], [provider_filter]))
+mask = np.logical_and.reduce(masks)
+sidebar_filtered_df = df.iloc[np.flatnonzero(mask)]
+
+# True when claim status is the only sidebar filter narrowing the data: every plan and
+# location selected, provider left at "All" and the full turnaround range. The daily
+# status cube covers all providers, so a single-provider selection must regroup the rows.
+only_status_filtered = (
+    set(insurance_filter) == set(insurance_options)
+    and set(location_filter) == set(location_options)
+    and provider_filter == "All"
+    and tuple(turnaround_range) == (min_days, max_days)
+)
 
 # ---------------- Dashboard ----------------
 st.title("📊 Claims Data Dashboard")
@@ -116,14 +348,15 @@ st.write("This dashboard shows summary data, trending, and key metrics.")
 st.subheader("Ask for a chart or filter your data (ex. 'Show denied claims from last month.')")
 
 filtered_df = sidebar_filtered_df
+applied_query = ""
 
-min_date_str = df["procedure_date"].min().strftime("%B %Y")
-max_date_str = df["procedure_date"].max().strftime("%B %Y")
+min_date_str = meta["date_min"].strftime("%B %Y")
+max_date_str = meta["date_max"].strftime("%B %Y")
 
 st.info(f"📅 Note: Data covers procedures from {min_date_str} to {max_date_str}. Date-based filters apply within this range.")
 
 # Dataset max date as anchor
-max_date = df["procedure_date"].max()
+max_date = meta["date_max"]
 
 # Calculate the first of this month relative to dataset max
 first_of_this_month = datetime(max_date.year, max_date.month, 1)
@@ -227,12 +460,13 @@ if user_question:
                 if is_valid_query(filter_query, valid_columns):
                     try:
                         st.write("GPT-generated filter_query:", filter_query)  # ✅ Debug line
-                        filtered_df = sidebar_filtered_df.query(filter_query)
+                        filtered_df = sidebar_filtered_df.query(filter_query, engine="numexpr")
+                        applied_query = filter_query
                     except Exception as e:
                         st.error(f"Error applying filter: {e}")
                         filtered_df = sidebar_filtered_df
                 else:
-                    st.warning("The chatbot generated a filter referencing invalid columns; ignoring filter.")
+                    st.warning("The chatbot generated an unsupported or unsafe filter expression; ignoring filter.")
                     filtered_df = sidebar_filtered_df
 
             if filtered_df.empty:
@@ -269,100 +503,49 @@ if user_question:
 st.caption("Powered by OpenAI")
 
 
+filter_key = (
+    data_path,
+    tuple(insurance_filter),
+    provider_filter,
+    tuple(status_filter),
+    tuple(location_filter),
+    tuple(turnaround_range),
+    applied_query
+)
+
+# With only claim status narrowing the data, the monthly trend can come from the cached cube
+status_cube = None
+if filtered_df is sidebar_filtered_df and only_status_filtered and status_filter:
+    cube = daily_status_cube(data_path)
+    # Keep the cube's category order (not pick order) so line colours match the groupby path
+    status_cube = cube[[status for status in cube.columns if status in status_filter]]
+summary = summarize_claims(filter_key, filtered_df, status_cube)
+
 st.subheader("📈 Key Performance Indicators")
 col1, col2, col3 = st.columns(3)
-col1.metric("Total Claims", f"{len(filtered_df):,}")
-col2.metric("Total Paid", f"${large_numbers(filtered_df['paid_amount'].sum())}")
-col3.metric("Denied Rate", f"{filtered_df['is_denied'].mean():.2%}")
+col1.metric("Total Claims", f"{summary['total_claims']:,}")
+col2.metric("Total Paid", f"${large_numbers(summary['total_paid']).item()}")
+col3.metric("Denied Rate", f"{summary['denied_rate']:.2%}")
 
 st.subheader("🔁 Turnaround Time Distribution")
-fig = px.histogram(
-    filtered_df,
-    x="turnaround_days",
-    nbins=30,
-    title="Distribution of Turnaround Times"
-)
-fig.update_layout(xaxis_title="Days", yaxis_title="Claim Count")
-st.plotly_chart(fig)
+st.plotly_chart(fig_turnaround(filter_key, filtered_df))
 
 with st.expander("👨‍⚕️ Top Providers by Paid Amount"):
-    top_prov = (
-        filtered_df.groupby("provider_id")["paid_amount"]
-        .sum()
-        .nlargest(10)
-        .reset_index()
-        .sort_values("paid_amount", ascending=True)
-    )
-    fig = px.bar(
-        top_prov,
-        x="paid_amount",
-        y="provider_id",
-        orientation="h",
-        title="Top 10 Providers by Paid Amount"
-    )
-    fig.update_traces(
-        text=[large_numbers(x) for x in top_prov["paid_amount"]],
-        textposition="inside",
-        insidetextanchor="start"
-    )
-    fig.update_layout(
-        xaxis_title="Total Paid $",
-        xaxis=dict(title=dict(text="Total Paid $", standoff=10), tickformat=".2s"),
-        yaxis_title="Provider",
-        yaxis=dict(autorange="reversed"),
-        margin=dict(l=80, r=40, t=40, b=60),
-        showlegend=False
-    )
-    st.plotly_chart(fig)
+    st.plotly_chart(fig_top_providers(filter_key, summary["top_prov"]))
 
 st.subheader("❌ Denial Reasons Breakdown")
-denials = filtered_df[filtered_df["is_denied"]]
-if denials.empty:
+if summary["denial_counts"].empty:
     st.info("No denied claims to display.")
 else:
-    denial_counts = denials["denial_reason"].value_counts().reset_index()
-    denial_counts.columns = ["denial_reason", "count"]
-    fig = px.pie(
-        denial_counts,
-        values="count",
-        names="denial_reason",
-        hole=0.4,
-        title="Denial Reasons Distribution"
-    )
-    fig.update_traces(textposition="inside", textinfo="percent+label")
-    st.plotly_chart(fig)
+    st.plotly_chart(fig_denial_reasons(filter_key, summary["denial_counts"]))
 
 st.subheader("📆 Claim Volume Over Time")
-monthly = (
-    filtered_df
-    .assign(month=lambda x: x["procedure_date"].dt.to_period("M").astype(str))
-    .groupby(["month", "claim_status"])
-    .size()
-    .reset_index(name="count")
-)
-fig = px.line(monthly, x="month", y="count", color="claim_status", title="Monthly Claim Status Trends")
-fig.update_layout(xaxis_title="Month", yaxis_title="Claims")
-st.plotly_chart(fig)
+st.plotly_chart(fig_monthly_status(filter_key, summary["monthly"]))
 
 st.subheader("🏥 Paid Amount by Service Location")
-loc_paid = (
-    filtered_df.groupby("service_location")["paid_amount"].sum().reset_index()
-)
-fig = px.bar(
-    loc_paid,
-    x="service_location",
-    y="paid_amount",
-    color="service_location",
-    title="Total Paid by Service Location"
-)
-fig.update_layout(showlegend=False, xaxis_title="Location", yaxis_title="Total Paid ($)")
-st.plotly_chart(fig)
+st.plotly_chart(fig_location_paid(filter_key, summary["loc_paid"]))
 
 st.subheader("💰 Paid by Insurance Plan")
-plan_paid = (
-    filtered_df.groupby("insurance_plan")["paid_amount"].sum().reset_index()
-)
-fig = px.treemap(plan_paid, path=["insurance_plan"], values="paid_amount", title="Paid Amount by Insurance Plan")
-st.plotly_chart(fig)
+st.plotly_chart(fig_plan_paid(filter_key, summary["plan_paid"]))
 
 st.markdown("\n*Tip: Use the sidebar to filter by plan, provider, location, status, or turnaround days.*")
@@ -1,5 +1,8 @@
 import streamlit as st
+import io
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 import plotly.express as px
 import os
 from dotenv import load_dotenv
@@ -9,9 +12,48 @@ load_dotenv()
 
 data_path = os.getenv("CLAIMS_DATA_PATH")
 
+@st.cache_resource
+def load_claims_table(path):
+    return pq.read_table(path)
+
+CATEGORY_COLUMNS = [
+    "insurance_plan", "claim_status", "service_location", "provider_id",
+    "denial_reason", "gender", "procedure_code", "diagnosis_code"
+]
+
+# Each entry is a whole encoded file rather than a small aggregate, so keep fewer than app.py's FILTER_CACHE_ENTRIES
+DOWNLOAD_CACHE_ENTRIES = 16
+
 @st.cache_data
 def load_claims_data(path):
-    return pd.read_csv(path, parse_dates=["procedure_date", "submission_date"])
+    df = load_claims_table(path).to_pandas()
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype("category")
+        df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+    return df.astype({
+        "is_denied": "bool",
+        "is_outlier": "bool",
+        "age": "int8",
+        "turnaround_days": "int16"
+    })
+
+def category_mask(col, selected):
+    # Boolean lookup table over the category codes; the extra slot maps -1 (missing) to False
+    lut = np.zeros(len(col.cat.categories) + 1, dtype=bool)
+    idx = col.cat.categories.get_indexer(selected)
+    lut[idx[idx >= 0]] = True
+    return lut[col.cat.codes.to_numpy()]
+
+@st.cache_data(max_entries=DOWNLOAD_CACHE_ENTRIES)
+def encode_parquet(filter_key, _df):
+    # Keyed on the filter selections; the leading underscore keeps Streamlit from hashing the frame
+    buf = io.BytesIO()
+    _df.to_parquet(buf, engine="pyarrow", compression="zstd", index=False)
+    return buf.getvalue()
+
+@st.cache_data(max_entries=DOWNLOAD_CACHE_ENTRIES)
+def encode_csv(filter_key, _df):
+    return _df.to_csv(index=False).encode('utf-8')
 
 df = load_claims_data(data_path)
 
@@ -24,10 +66,10 @@ if st.button("⬅️ Back to Dashboard"):
 
 # Initialize session state for filters if not already set
 for filter_key, default in {
-    "providers": df["provider_id"].unique().tolist(),
-    "insurance_plans": df["insurance_plan"].unique().tolist(),
-    "service_locations": df["service_location"].unique().tolist(),
-    "claim_status": df["claim_status"].unique().tolist()
+    "providers": df["provider_id"].cat.categories.tolist(),
+    "insurance_plans": df["insurance_plan"].cat.categories.tolist(),
+    "service_locations": df["service_location"].cat.categories.tolist(),
+    "claim_status": df["claim_status"].cat.categories.tolist()
 }.items():
     if filter_key not in st.session_state:
         st.session_state[filter_key] = default
@@ -42,56 +84,76 @@ with st.sidebar:
 
     providers = st.multiselect(
         "Provider",
-        options=df["provider_id"].unique(),
+        options=df["provider_id"].cat.categories,
         default=st.session_state["providers"],
         key="providers"
     )
 
     insurance_plans = st.multiselect(
         "Insurance Plan",
-        options=df["insurance_plan"].unique(),
+        options=df["insurance_plan"].cat.categories,
         default=st.session_state["insurance_plans"],
         key="insurance_plans"
     )
 
     service_locations = st.multiselect(
         "Service Location",
-        options=df["service_location"].unique(),
+        options=df["service_location"].cat.categories,
         default=st.session_state["service_locations"],
         key="service_locations"
     )
 
     claim_status = st.multiselect(
         "Claim Status",
-        options=df["claim_status"].unique(),
+        options=df["claim_status"].cat.categories,
         default=st.session_state["claim_status"],
         key="claim_status"
     )
 
 # Apply filters
-filtered_df = df[
-    (df["procedure_date"] >= pd.to_datetime(date_range[0])) &
-    (df["procedure_date"] <= pd.to_datetime(date_range[1])) &
-    (df["provider_id"].isin(providers)) &
-    (df["insurance_plan"].isin(insurance_plans)) &
-    (df["service_location"].isin(service_locations)) &
-    (df["claim_status"].isin(claim_status))
-]
+procedure_dates = df["procedure_date"].to_numpy()
+mask = np.logical_and.reduce([
+    procedure_dates >= pd.to_datetime(date_range[0]).to_datetime64(),
+    procedure_dates <= pd.to_datetime(date_range[1]).to_datetime64(),
+    category_mask(df["provider_id"], providers),
+    category_mask(df["insurance_plan"], insurance_plans),
+    category_mask(df["service_location"], service_locations),
+    category_mask(df["claim_status"], claim_status)
+])
+filtered_df = df.iloc[np.flatnonzero(mask)]
 
 st.subheader(f"Filtered Claims ({len(filtered_df):,})")
 st.dataframe(filtered_df, use_container_width=True)
 
-# Download filtered data
-st.download_button(
-    label="📥 Download Filtered Claims as CSV",
-    data=filtered_df.to_csv(index=False).encode('utf-8'),
-    file_name="filtered_claims.csv",
-    mime="text/csv"
+filter_key = (
+    data_path,
+    tuple(date_range),
+    tuple(providers),
+    tuple(insurance_plans),
+    tuple(service_locations),
+    tuple(claim_status)
 )
 
+# Download filtered data
+download_format = st.radio("Download format", ["Parquet", "CSV"], horizontal=True)
+if download_format == "Parquet":
+    st.download_button(
+        label="📥 Download Filtered Claims as Parquet",
+        data=encode_parquet(filter_key, filtered_df),
+        file_name="filtered_claims.parquet",
+        mime="application/vnd.apache.parquet"
+    )
+else:
+    st.download_button(
+        label="📥 Download Filtered Claims as CSV",
+        data=encode_csv(filter_key, filtered_df),
+        file_name="filtered_claims.csv",
+        mime="text/csv"
+    )
+
 # Optional Paid vs Denied by Provider visual
 viz_df = (
-    filtered_df.groupby(["provider_id", "claim_status"])["paid_amount"]
+    filtered_df.groupby(["provider_id", "claim_status"], observed=True)["paid_amount"]
     .sum()
     .reset_index()
 )
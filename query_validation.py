@@ -0,0 +1,78 @@
+import ast
+import re
+
+# Expression nodes a chatbot filter may contain: comparisons and boolean/arithmetic logic over
+# column names and literals. Anything else (calls, subscripts, lambdas, ...) is rejected.
+ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare,
+    ast.Name, ast.Constant, ast.List, ast.Tuple, ast.Load,
+    ast.boolop, ast.operator, ast.unaryop, ast.cmpop
+)
+
+# Read-only accessors allowed on a column: `col.dt.<field>`, `col.str.<method>(<literals>)`,
+# `col.isin(<list of literals>)` and `col.between(<literal>, <literal>)`
+DT_FIELDS = {"year", "month", "day", "dayofweek", "quarter"}
+STR_METHODS = {"contains", "startswith", "endswith"}
+
+QUOTED_PLACEHOLDER = "_quoted_column"
+
+
+def is_valid_query(filter_str: str, valid_columns: list) -> bool:
+    """
+    Check that the filter is a plain pandas query expression over valid_columns.
+    """
+    # Backtick-quoted names aren't Python syntax; check them here and parse a placeholder instead
+    if any(name not in valid_columns for name in re.findall(r"`([^`]*)`", filter_str)):
+        return False
+    try:
+        tree = ast.parse(re.sub(r"`[^`]*`", QUOTED_PLACEHOLDER, filter_str), mode="eval")
+    except SyntaxError:
+        return False
+    return _is_allowed(tree, set(valid_columns) | {QUOTED_PLACEHOLDER})
+
+
+def _is_column(node: ast.AST, columns: set) -> bool:
+    return isinstance(node, ast.Name) and node.id in columns
+
+
+def _is_accessor(node: ast.AST, accessor: str, columns: set) -> bool:
+    # Matches `<column>.<accessor>`, e.g. procedure_date.dt
+    return isinstance(node, ast.Attribute) and node.attr == accessor and _is_column(node.value, columns)
+
+
+def _is_literal(node: ast.AST) -> bool:
+    # A constant, or a signed numeric constant such as -5 (parsed as a UnaryOp)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        node = node.operand
+    return isinstance(node, ast.Constant)
+
+
+def _is_allowed_call(node: ast.Call, columns: set) -> bool:
+    func = node.func
+    if not isinstance(func, ast.Attribute):
+        return False
+    if not all(_is_literal(kw.value) for kw in node.keywords):
+        return False
+    if func.attr in STR_METHODS and _is_accessor(func.value, "str", columns):
+        return all(_is_literal(arg) for arg in node.args)
+    if func.attr == "isin" and _is_column(func.value, columns):
+        return (
+            len(node.args) == 1
+            and isinstance(node.args[0], (ast.List, ast.Tuple))
+            and all(_is_literal(elt) for elt in node.args[0].elts)
+        )
+    if func.attr == "between" and _is_column(func.value, columns):
+        return len(node.args) == 2 and all(_is_literal(arg) for arg in node.args)
+    return False
+
+
+def _is_allowed(node: ast.AST, columns: set) -> bool:
+    if isinstance(node, ast.Name):
+        return node.id in columns
+    if isinstance(node, ast.Attribute):
+        return node.attr in DT_FIELDS and _is_accessor(node.value, "dt", columns)
+    if isinstance(node, ast.Call):
+        return _is_allowed_call(node, columns)
+    if not isinstance(node, ALLOWED_NODES):
+        return False
+    return all(_is_allowed(child, columns) for child in ast.iter_child_nodes(node))
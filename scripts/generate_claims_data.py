@@ -1,7 +1,7 @@
+import numpy as np
 import pandas as pd
-import random
-import uuid
-from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 import os
 from pathlib import Path
@@ -10,20 +10,18 @@ from dotenv import load_dotenv
 # Load .env
 project_root = Path(__file__).resolve().parent.parent
 load_dotenv(dotenv_path=project_root / ".env")
-output_path = project_root / os.getenv("CLAIMS_DATA_PATH")
+output_path = (project_root / os.getenv("CLAIMS_DATA_PATH")).with_suffix(".parquet")
 
 n_rows = 100_000
+batch_size = 10_000
 num_patients = 50000
 
+rng = np.random.default_rng()
+
 # Patients
-patient_ids = [f"PT{i+1:05d}" for i in range(num_patients)]
+patient_ids = np.array([f"PT{i+1:05d}" for i in range(num_patients)])
 high_utilizers = patient_ids[:int(num_patients * 0.3)]
 regular_patients = patient_ids[int(num_patients * 0.3):]
-weighted_patient_pool = (
-    random.choices(high_utilizers, k=70000) +
-    random.choices(regular_patients, k=30000)
-)
-random.shuffle(weighted_patient_pool)
 
 # Value Pools
 value_pools = {
@@ -31,6 +29,7 @@ value_pools = {
                         '80050', '80053', '81001', '81002', '90471', '90472', '36415', '87635',
                         '99406', '29580', '11720'],
     "insurance_plans": ['Blue Cross', 'Aetna', 'UnitedHealthcare', 'Medicare', 'Medicaid', 'Cigna'],
+    "insurance_multipliers": [1.0, 0.9, 0.7, 1.4, 0.6, 0.8],  # aligned with insurance_plans
     "denial_reasons": [
         'Coverage not active',
         'Service not covered',
@@ -42,130 +41,158 @@ value_pools = {
     "denial_weights": [0.1, 0.15, 0.35, 0.2, 0.15, 0.05],  # realistic skew
     "genders": ['Male', 'Female', 'Unknown'],
     "service_locations": ['Hospital', 'Clinic', 'Telehealth'],
+    "billed_ranges": [(5000, 100000), (500, 15000), (50, 1000)],  # aligned with service_locations
     "providers": [f"PROV{i:03d}" for i in range(1, 21)],
     "provider_weights": [0.1]*2 + [0.05]*3 + [0.04]*5 + [0.03]*10  # Top 2 providers dominate
 }
 
-claims = []
-
-for i in range(n_rows):
-    claim_id = str(uuid.uuid4())
-    patient_id = weighted_patient_pool[i]
-    is_outlier = False
+# Seasonal Diagnosis pools: (months, codes, weights)
+seasonal_diagnoses = [
+    (
+        [12, 1, 2],
+        ['J02.9', 'R05', 'B34.9', 'J45.909', 'Z23', 'R07.9',
+         'N39.0', 'Z00.00', 'F41.1', 'E11.9', 'I10', 'E78.5',
+         'M54.5', 'Z79.899', 'F32.9', 'R10.9', 'Z13.6', 'Z01.419',
+         'H52.4', 'S93.4', 'K21.9'],
+        [0.15, 0.08, 0.1, 0.1, 0.1, 0.07,
+         0.05, 0.05, 0.04, 0.04, 0.03, 0.03,
+         0.02, 0.02, 0.01, 0.01, 0.01, 0.01,
+         0.005, 0.005, 0.005]
+    ),
+    (
+        [6, 7, 8],
+        ['Z00.00', 'S93.4', 'M54.5', 'R51', 'Z01.419', 'F41.1',
+         'I10', 'E11.9', 'Z79.899', 'E78.5', 'Z13.6', 'R10.9',
+         'F32.9', 'N39.0', 'Z23', 'H52.4', 'R07.9', 'K21.9',
+         'B34.9', 'J02.9', 'J45.909'],
+        [0.15, 0.12, 0.1, 0.1, 0.08, 0.07,
+         0.05, 0.05, 0.05, 0.04, 0.03, 0.03,
+         0.02, 0.02, 0.02, 0.01, 0.01, 0.01,
+         0.005, 0.005, 0.005]
+    ),
+    (
+        [3, 4, 5, 9, 10, 11],
+        ['E11.9', 'I10', 'M54.5', 'F41.1', 'K21.9', 'N39.0',
+         'Z23', 'Z00.00', 'E78.5', 'Z79.899', 'R07.9', 'B34.9',
+         'R05', 'J02.9', 'J45.909', 'F32.9', 'Z13.6', 'H52.4',
+         'S93.4', 'R10.9', 'Z01.419'],
+        [0.1, 0.1, 0.1, 0.08, 0.07, 0.07,
+         0.06, 0.06, 0.05, 0.05, 0.04, 0.03,
+         0.02, 0.02, 0.02, 0.01, 0.01, 0.01,
+         0.005, 0.005, 0.005]
+    )
+]
+
+
+def cdf(weights) -> np.ndarray:
+    # Normalised cumulative weights; np.searchsorted(cdf, u) turns uniforms into weighted draws
+    cumulative = np.cumsum(weights, dtype=float)
+    return cumulative / cumulative[-1]
+
+
+# Diagnosis codes share one label list across seasons so they can be stored as category codes
+diagnosis_labels = sorted({code for _, codes, _ in seasonal_diagnoses for code in codes})
+season_samplers = [
+    (months, np.array([diagnosis_labels.index(code) for code in codes], dtype=np.int8), cdf(weights))
+    for months, codes, weights in seasonal_diagnoses
+]
+provider_cdf = cdf(value_pools["provider_weights"])
+denial_cdf = cdf(value_pools["denial_weights"])
+
+
+def generate_batch(start: int, size: int) -> pd.DataFrame:
+    """
+    Generate claims start+1 .. start+size as a DataFrame.
+    """
+    claim_id = np.char.mod("CL%07d", np.arange(start + 1, start + size + 1))
+
+    # ~70% of claims come from the high-utilizer pool
+    patient_id = np.where(
+        rng.random(size) < 0.7,
+        rng.choice(high_utilizers, size),
+        rng.choice(regular_patients, size)
+    )
 
     # Patient info
-    age = random.randint(18, 99)
-    gender = random.choice(value_pools["genders"])
+    age = rng.integers(18, 100, size)
+    gender = rng.choice(value_pools["genders"], size)
 
     # Date skewed toward recent
-    days_ago = int(random.triangular(0, 730, 0))
-    procedure_date = datetime.today() - timedelta(days=days_ago)
-    submission_delay = random.randint(0, 30)
-    submission_date = procedure_date + timedelta(days=submission_delay)
-    procedure_date_str = procedure_date.strftime('%Y-%m-%d')
-    submission_date_str = submission_date.strftime('%Y-%m-%d')
+    days_ago = rng.triangular(0, 0, 730, size).astype(int)
+    procedure_date = np.datetime64("today", "D") - days_ago.astype("timedelta64[D]")
+    submission_delay = rng.integers(0, 31, size)
+    submission_date = procedure_date + submission_delay.astype("timedelta64[D]")
 
     # Insurance
-    insurance_plan = random.choice(value_pools["insurance_plans"])
-    insurance_multiplier = {
-        "Medicaid": 0.6, "Medicare": 1.4, "Cigna": 0.8,
-        "Aetna": 0.9, "Blue Cross": 1.0, "UnitedHealthcare": 0.7
-    }[insurance_plan]
+    plan_idx = rng.integers(0, len(value_pools["insurance_plans"]), size)
+    insurance_plan = np.asarray(value_pools["insurance_plans"])[plan_idx]
+    insurance_multiplier = np.asarray(value_pools["insurance_multipliers"])[plan_idx]
 
     # Seasonal Diagnosis
-    month = procedure_date.month
-    if month in [12, 1, 2]:
-        diagnosis_code = random.choices(
-            ['J02.9', 'R05', 'B34.9', 'J45.909', 'Z23', 'R07.9',
-             'N39.0', 'Z00.00', 'F41.1', 'E11.9', 'I10', 'E78.5',
-             'M54.5', 'Z79.899', 'F32.9', 'R10.9', 'Z13.6', 'Z01.419',
-             'H52.4', 'S93.4', 'K21.9'],
-            weights=[0.15, 0.08, 0.1, 0.1, 0.1, 0.07,
-                     0.05, 0.05, 0.04, 0.04, 0.03, 0.03,
-                     0.02, 0.02, 0.01, 0.01, 0.01, 0.01,
-                     0.005, 0.005, 0.005]
-        )[0]
-    elif month in [6, 7, 8]:
-        diagnosis_code = random.choices(
-            ['Z00.00', 'S93.4', 'M54.5', 'R51', 'Z01.419', 'F41.1',
-             'I10', 'E11.9', 'Z79.899', 'E78.5', 'Z13.6', 'R10.9',
-             'F32.9', 'N39.0', 'Z23', 'H52.4', 'R07.9', 'K21.9',
-             'B34.9', 'J02.9', 'J45.909'],
-            weights=[0.15, 0.12, 0.1, 0.1, 0.08, 0.07,
-                     0.05, 0.05, 0.05, 0.04, 0.03, 0.03,
-                     0.02, 0.02, 0.02, 0.01, 0.01, 0.01,
-                     0.005, 0.005, 0.005]
-        )[0]
-    else:
-        diagnosis_code = random.choices(
-            ['E11.9', 'I10', 'M54.5', 'F41.1', 'K21.9', 'N39.0',
-             'Z23', 'Z00.00', 'E78.5', 'Z79.899', 'R07.9', 'B34.9',
-             'R05', 'J02.9', 'J45.909', 'F32.9', 'Z13.6', 'H52.4',
-             'S93.4', 'R10.9', 'Z01.419'],
-            weights=[0.1, 0.1, 0.1, 0.08, 0.07, 0.07,
-                     0.06, 0.06, 0.05, 0.05, 0.04, 0.03,
-                     0.02, 0.02, 0.02, 0.01, 0.01, 0.01,
-                     0.005, 0.005, 0.005]
-        )[0]
-
-    procedure_code = random.choice(value_pools["procedure_codes"])
-    provider_id = random.choices(value_pools["providers"], weights=value_pools["provider_weights"])[0]
-    service_location = random.choice(value_pools["service_locations"])
+    month = procedure_date.astype("datetime64[M]").astype(int) % 12 + 1
+    diagnosis_idx = np.empty(size, dtype=np.int8)
+    for months, code_idx, season_cdf in season_samplers:
+        in_season = np.isin(month, months)
+        draws = np.searchsorted(season_cdf, rng.random(in_season.sum()), side="right")
+        diagnosis_idx[in_season] = code_idx[draws]
+    diagnosis_code = pd.Categorical.from_codes(diagnosis_idx, diagnosis_labels)
+
+    procedure_code = rng.choice(value_pools["procedure_codes"], size)
+    provider_id = pd.Categorical.from_codes(
+        np.searchsorted(provider_cdf, rng.random(size), side="right"), value_pools["providers"]
+    )
+    location_idx = rng.integers(0, len(value_pools["service_locations"]), size)
+    service_location = np.asarray(value_pools["service_locations"])[location_idx]
 
     # Turnaround time
-    if random.random() < 0.005:
-        turnaround_days = 0
-        is_outlier = True
-    else:
-        turnaround_days = random.randint(5, 30)
+    turnaround_outlier = rng.random(size) < 0.005
+    turnaround_days = np.where(turnaround_outlier, 0, rng.integers(5, 31, size))
+    is_outlier = turnaround_outlier
 
     # Billing by location
-    if service_location == "Hospital":
-        billed_amount = round(random.uniform(5000, 100000), 2)
-    elif service_location == "Clinic":
-        billed_amount = round(random.uniform(500, 15000), 2)
-    else:
-        billed_amount = round(random.uniform(50, 1000), 2)
+    billed_low, billed_high = np.asarray(value_pools["billed_ranges"], dtype=float).T
+    billed_amount = np.round(rng.uniform(billed_low[location_idx], billed_high[location_idx]), 2)
 
     # Outlier tag (rarely override above range)
-    if random.random() < 0.015:
-        billed_amount = round(random.uniform(100000, 200000), 2)
-        is_outlier = True
+    billed_outlier = rng.random(size) < 0.015
+    billed_amount = np.where(billed_outlier, np.round(rng.uniform(100000, 200000, size), 2), billed_amount)
+    is_outlier = is_outlier | billed_outlier
 
     # Status logic
-    pending_chance = random.random()
-    if pending_chance < 0.05:
-        claim_status = "Pending"
-        is_denied = False
-        denial_reason = None
-        paid_amount = 0.0
-    elif pending_chance < 0.15:
-        claim_status = "Denied"
-        is_denied = True
-        denial_reason = random.choices(value_pools["denial_reasons"], weights=value_pools["denial_weights"])[0]
-        paid_amount = 0.0
-    else:
-        if random.random() < 0.02:
-            claim_status = "Denied"
-            is_denied = True
-            denial_reason = "Audited denial – outlier detected"
-            paid_amount = 0.0
-            is_outlier = True
-        else:
-            claim_status = "Paid"
-            is_denied = False
-            denial_reason = None
-            paid_amount = round(billed_amount * random.uniform(0.5, 0.9) * insurance_multiplier, 2)
-
-    claims.append({
+    pending_chance = rng.random(size)
+    pending = pending_chance < 0.05
+    denied = (pending_chance >= 0.05) & (pending_chance < 0.15)
+    audited = (pending_chance >= 0.15) & (rng.random(size) < 0.02)
+    paid = ~(pending | denied | audited)
+
+    # Integer codes per row, mapped to labels once via Categorical.from_codes
+    status_labels = ["Paid", "Denied", "Pending"]
+    status_code = np.select([pending, denied | audited], [2, 1], 0)
+    claim_status = pd.Categorical.from_codes(status_code, status_labels)
+    is_denied = denied | audited
+    is_outlier = is_outlier | audited
+
+    denial_labels = value_pools["denial_reasons"] + ["Audited denial – outlier detected"]
+    denial_code = np.full(size, -1, dtype=np.int8)  # -1 -> no denial reason
+    denial_code[denied] = np.searchsorted(denial_cdf, rng.random(denied.sum()), side="right")
+    denial_code[audited] = len(denial_labels) - 1
+    denial_reason = pd.Categorical.from_codes(denial_code, denial_labels)
+
+    paid_amount = np.where(
+        paid,
+        np.round(billed_amount * rng.uniform(0.5, 0.9, size) * insurance_multiplier, 2),
+        0.0
+    )
+
+    return pd.DataFrame({
         "claim_id": claim_id,
         "patient_id": patient_id,
         "age": age,
         "gender": gender,
         "procedure_code": procedure_code,
         "diagnosis_code": diagnosis_code,
-        "procedure_date": procedure_date_str,
-        "submission_date": submission_date_str,
+        "procedure_date": procedure_date,
+        "submission_date": submission_date,
         "turnaround_days": turnaround_days,
         "insurance_plan": insurance_plan,
         "claim_status": claim_status,
@@ -178,6 +205,16 @@ for i in range(n_rows):
         "provider_id": provider_id
     })
 
-df = pd.DataFrame(claims)
-df.to_csv(output_path, index=False)
-print(f"✅ CSV with {n_rows:,} claims written to {output_path}")
+
+def batch_table(start: int) -> pa.Table:
+    return pa.Table.from_pandas(generate_batch(start, min(batch_size, n_rows - start)), preserve_index=False)
+
+
+# Stream batches into the Parquet file so memory stays flat as n_rows grows.
+# The first batch fixes the schema; the context manager closes the writer (and writes the footer) on any exit.
+first_batch = batch_table(0)
+with pq.ParquetWriter(output_path, first_batch.schema, compression="zstd", use_dictionary=True) as writer:
+    writer.write_table(first_batch)
+    for start in range(batch_size, n_rows, batch_size):
+        writer.write_table(batch_table(start))
+print(f"✅ Parquet with {n_rows:,} claims written to {output_path}")
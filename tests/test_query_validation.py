@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+
+from query_validation import is_valid_query
+
+COLUMNS = [
+    "claim_id", "patient_id", "age", "gender", "procedure_code", "diagnosis_code",
+    "procedure_date", "submission_date", "turnaround_days", "insurance_plan", "claim_status",
+    "is_denied", "is_outlier", "denial_reason", "billed_amount", "paid_amount",
+    "service_location", "provider_id"
+]
+
+
+@pytest.mark.parametrize("filter_str", [
+    # Filters the system prompt steers the chatbot towards
+    "claim_status == 'Denied' and procedure_date >= '2025-05-01' and procedure_date <= '2025-05-31'",
+    "turnaround_days < 5",
+    "gender == 'Female' and age > 50",
+    "gender == 'Male' and age < 30",
+    "insurance_plan != 'Medicare' and insurance_plan != 'Medicaid'",
+    "billed_amount >= 100000",
+    "claim_status in ['Denied', 'Pending']",
+    "service_location == 'Hospital' or provider_id == 'PROV001'",
+    "is_denied == True",
+    "not is_outlier",
+    "paid_amount > billed_amount * 0.5",
+    "`billed_amount` > 1000",
+    "procedure_date.dt.month == 5",
+    "denial_reason.str.contains('prior', case=False)",
+    "diagnosis_code.str.startswith('J')",
+    "claim_status.isin(['Denied', 'Pending'])",
+    "billed_amount.between(100, 200)",
+    "procedure_date.between('2025-05-01', '2025-05-31') and age.between(-1, 30)",
+    "provider_id.isin(('PROV001',)) and paid_amount.between(0, 500, inclusive='both')",
+])
+def test_accepts_prompt_style_filters(filter_str):
+    assert is_valid_query(filter_str, COLUMNS)
+
+
+@pytest.mark.parametrize("filter_str", [
+    # Method calls that write files or run code must never reach df.query
+    "claim_id.to_csv('/tmp/pwn.csv') == 1",
+    "age.to_frame().to_pickle('/tmp/pwn.pkl') == 1",
+    "paid_amount.to_parquet('/tmp/pwn.parquet') == 1",
+    "__import__('os').system('id') == 0",
+    "age.__class__ == 1",
+    "denial_reason.str.contains(claim_id.to_csv('/tmp/pwn.csv'))",
+    "claim_id.str.cat() == ''",
+    "procedure_date.dt.strftime('%Y') == '2025'",
+    "age.apply(print) == 1",
+    "(lambda: 1)() == 1",
+    "age[0] == 1",
+    # isin/between only take literals and only on a bare column
+    "claim_status.isin(claim_id.to_csv('/tmp/pwn.csv'))",
+    "claim_status.isin([claim_id.to_csv('/tmp/pwn.csv')])",
+    "claim_status.isin(['Denied'], print)",
+    "billed_amount.between(0, paid_amount.to_csv('/tmp/pwn.csv'))",
+    "billed_amount.between(0)",
+    "foo.isin(['Denied'])",
+    "procedure_date.dt.month.between(1, 3)",
+    "@age > 1",
+    # Unknown columns, quoted or not
+    "foo > 1",
+    "`billed amount` > 1",
+    # Not a single expression
+    "age > 1; import os",
+    "age >",
+])
+def test_rejects_calls_and_unknown_names(filter_str):
+    assert not is_valid_query(filter_str, COLUMNS)
+
+
+def test_accepted_filters_evaluate_with_numexpr():
+    df = pd.DataFrame({
+        "age": [25, 60, 70],
+        "claim_status": pd.Categorical(["Paid", "Denied", "Denied"]),
+        "procedure_date": pd.to_datetime(["2025-04-10", "2025-05-02", "2025-05-20"]),
+    })
+    filter_str = "claim_status == 'Denied' and age > 50 and procedure_date.dt.month == 5"
+    assert is_valid_query(filter_str, df.columns.tolist())
+    assert len(df.query(filter_str, engine="numexpr")) == 2
+
+    filter_str = "claim_status.isin(['Denied', 'Pending']) and age.between(50, 65)"
+    assert is_valid_query(filter_str, df.columns.tolist())
+    assert len(df.query(filter_str, engine="numexpr")) == 1